@@ -1,16 +1,23 @@
+import startup
+import profiler
+import responses
 from flask import Flask, jsonify, request
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 import os
 from config import Config
-from routes.auth_routes import auth_bp, query_bp
-from routes.protected_routes import protected_bp
+with startup.timed("import routes"):
+    from routes.auth_routes import auth_bp, query_bp
+    from routes.protected_routes import protected_bp
 
 # ---------------- Flask Setup ---------------- #
 app = Flask(__name__)
 app.config["SECRET_KEY"] = Config.SECRET_KEY
 app.config["JWT_SECRET_KEY"] = Config.SECRET_KEY
 
+# ---------------- JSON + Compression ---------------- #
+responses.init_app(app)
+
 # ---------------- JWT Setup ---------------- #
 jwt = JWTManager(app)
 
@@ -36,9 +43,31 @@ CORS(
     supports_credentials=True,
     resources={r"/*": {"origins":"*"}},
     allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["Authorization"]
+    expose_headers=["Authorization", "ETag", "X-Cursor", "X-Next-Before"]
 )
 
+# ---------------- Warm-up ---------------- #
+# Auth routes are ready now; indexes, the refresher and (optionally) the scan
+# stack and Mongo ping are set up in the background.
+startup.mark("app_ready_s")
+startup.start_background_services()
+if Config.WARMUP_SCAN_STACK:
+    startup.start_warmup()
+
+@app.before_request
+def mark_first_request():
+    startup.mark("first_request_s")
+
+# ---------------- Sampling Profiler Hooks ---------------- #
+# Cheap no-ops unless an admin has started a session (see profiler.py)
+@app.before_request
+def profiler_track():
+    profiler.request_started(request.path)
+
+@app.teardown_request
+def profiler_untrack(exc):
+    profiler.request_finished()
+
 # ---------------- Debug Helpers ---------------- #
 # This will print headers for every request (to confirm token is received)
 @app.before_request
@@ -117,6 +146,31 @@ def model_status():
         return jsonify({
             "error": f"Failed to check model status: {str(e)}"
         }), 500
+@app.route('/api/debug/startup')
+def startup_profile():
+    return jsonify(startup.report())
+
+@app.route('/api/debug/page-cache')
+def page_cache_stats():
+    import page_cache
+    return jsonify(page_cache.stats())
+
+@app.route('/api/debug/refresher')
+def refresher_stats():
+    import domain_cache
+    import refresher
+    return jsonify({"refresher": refresher.stats(), "domain_cache": domain_cache.stats()})
+
+@app.route('/api/debug/cache')
+def cache_stats():
+    import cache
+    return jsonify(cache.stats())
+
+@app.route('/api/debug/hashing')
+def hashing_metrics():
+    from hashing import metrics
+    return jsonify(metrics())
+
 @app.route('/api/debug/dependencies')
 def check_dependencies():
     try:
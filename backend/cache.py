@@ -0,0 +1,338 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import Config
+
+# Result cache shared by the scan pipeline. Two interchangeable backends:
+#   memory — per-process LRU (handy for local runs)
+#   sqlite — one WAL-mode SQLite file on local disk, shared by every gunicorn
+#            worker on the host, so one worker's results serve the others
+# Values must be JSON-serialisable. Both backends support TTLs, a size limit,
+# get_or_compute() that lets only one caller compute a missing key, and
+# hit-rate stats (counted per process, one hit or miss per get/get_or_compute;
+# peek() and the polling inside get_or_compute don't count).
+
+_MISSING = object()
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "sets": 0, "computes": 0, "waits": 0, "evictions": 0}
+
+    def bump(self, key: str, delta: int = 1):
+        with self._lock:
+            self.counts[key] += delta
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = dict(self.counts)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._computing = {}
+        self.stats = _Stats()
+
+    def _read(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+        return _MISSING
+
+    def peek(self, key: str, default=None):
+        value = self._read(key)
+        return default if value is _MISSING else value
+
+    def get(self, key: str, default=None):
+        value = self._read(key)
+        if value is _MISSING:
+            self.stats.bump("misses")
+            return default
+        self.stats.bump("hits")
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.bump("evictions")
+        self.stats.bump("sets")
+
+    def get_or_compute(self, key: str, compute, ttl: float, should_store=None, wait: float = 30.0,
+                       lock_ttl: float = None):  # pylint: disable=unused-argument
+        # lock_ttl only matters across processes; an owner here can't vanish silently
+        value = self._read(key)
+        if value is not _MISSING:
+            self.stats.bump("hits")
+            return value
+        with self._lock:
+            event = self._computing.get(key)
+            owner = event is None
+            if owner:
+                event = self._computing[key] = threading.Event()
+        if not owner:
+            self.stats.bump("waits")
+            event.wait(wait)
+            value = self._read(key)
+            if value is not _MISSING:
+                self.stats.bump("hits")
+                return value
+            return self._compute(key, compute, ttl, should_store)
+        try:
+            return self._compute(key, compute, ttl, should_store)
+        finally:
+            with self._lock:
+                self._computing.pop(key, None)
+            event.set()
+
+    def _compute(self, key, compute, ttl, should_store):
+        self.stats.bump("misses")
+        self.stats.bump("computes")
+        value = compute()
+        if should_store is None or should_store(value):
+            self.set(key, value, ttl)
+        return value
+
+    def info(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return dict(self.stats.snapshot(), backend=self.name, entries=entries)
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    # Check the size limit every this many writes rather than on each one
+    TRIM_EVERY = 50
+    # Default for how long a compute lock is honoured before others assume its
+    # owner died; callers whose compute can run longer pass their own lock_ttl
+    LOCK_TTL = 60.0
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self.stats = _Stats()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, stored_at REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS locks ("
+                " key TEXT PRIMARY KEY, owner TEXT NOT NULL DEFAULT '', expires_at REAL NOT NULL)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(locks)")]
+        if "owner" not in columns:
+            # Cache files made before locks had owners
+            try:
+                with self._conn() as conn:
+                    conn.execute("ALTER TABLE locks ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads; one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, key: str):
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return _MISSING if row is None else json.loads(row[0])
+
+    def peek(self, key: str, default=None):
+        value = self._read(key)
+        return default if value is _MISSING else value
+
+    def get(self, key: str, default=None):
+        value = self._read(key)
+        if value is _MISSING:
+            self.stats.bump("misses")
+            return default
+        self.stats.bump("hits")
+        return value
+
+    def set(self, key: str, value, ttl: float):
+        now = time.time()
+        payload = json.dumps(value, default=str)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, stored_at, size)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, payload, now + ttl, now, len(payload)),
+            )
+        self.stats.bump("sets")
+        with self._writes_lock:
+            self._writes += 1
+            trim = self._writes % self.TRIM_EVERY == 0
+        if trim:
+            self._trim()
+
+    def _trim(self):
+        now = time.time()
+        with self._conn() as conn:
+            removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+            conn.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop the oldest-written entries until back under the limit
+                rows = conn.execute("SELECT key, size FROM cache ORDER BY stored_at").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+                removed += len(doomed)
+        if removed:
+            self.stats.bump("evictions", removed)
+
+    def _try_lock(self, key: str, lock_ttl: float):
+        """Owner token if we now hold the lock on `key`, else None."""
+        owner = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            # Take the write lock up front so clearing a stale lock and claiming
+            # it can't interleave with another worker doing the same
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM locks WHERE key = ? AND expires_at <= ?", (key, now))
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + lock_ttl),
+            )
+        return owner if cur.rowcount == 1 else None
+
+    def _unlock(self, key: str, owner: str):
+        # Only our own lock: if it expired and someone else took it, leave theirs
+        with self._conn() as conn:
+            conn.execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+    def get_or_compute(self, key: str, compute, ttl: float, should_store=None, wait: float = 30.0,
+                       lock_ttl: float = None):
+        value = self._read(key)
+        if value is not _MISSING:
+            self.stats.bump("hits")
+            return value
+
+        lock_ttl = self.LOCK_TTL if lock_ttl is None else lock_ttl
+        # Another worker is already computing it: wait for its result, up to `wait`
+        deadline = time.monotonic() + wait
+        waited = False
+        while True:
+            owner = self._try_lock(key, lock_ttl)
+            if owner is not None:
+                break
+            if not waited:
+                self.stats.bump("waits")
+                waited = True
+            if time.monotonic() >= deadline:
+                return self._compute(key, compute, ttl, should_store)
+            time.sleep(0.05)
+            value = self._read(key)
+            if value is not _MISSING:
+                self.stats.bump("hits")
+                return value
+
+        try:
+            # It may have landed between our first look and taking the lock
+            value = self._read(key)
+            if value is not _MISSING:
+                self.stats.bump("hits")
+                return value
+            return self._compute(key, compute, ttl, should_store)
+        finally:
+            self._unlock(key, owner)
+
+    def _compute(self, key, compute, ttl, should_store):
+        self.stats.bump("misses")
+        self.stats.bump("computes")
+        value = compute()
+        if should_store is None or should_store(value):
+            self.set(key, value, ttl)
+        return value
+
+    def info(self) -> dict:
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return dict(self.stats.snapshot(), backend=self.name, path=self.path,
+                    entries=row[0], bytes=row[1], max_bytes=self.max_bytes)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if Config.CACHE_BACKEND == "sqlite":
+                try:
+                    _backend = SqliteBackend(Config.CACHE_PATH, Config.CACHE_MAX_BYTES)
+                except sqlite3.Error as e:
+                    print(f"❌ Shared cache unavailable ({e}), using in-process cache")
+            if _backend is None:
+                _backend = MemoryBackend(Config.CACHE_MAX_ENTRIES)
+        return _backend
+
+
+def get(key: str, default=None):
+    return backend().get(key, default)
+
+
+def peek(key: str, default=None):
+    """Like get(), but not counted in the hit-rate stats."""
+    return backend().peek(key, default)
+
+
+def put(key: str, value, ttl: float):
+    backend().set(key, value, ttl)
+
+
+def get_or_compute(key: str, compute, ttl: float, should_store=None, wait: float = 30.0,
+                   lock_ttl: float = None):
+    """Cached value, or compute() it with only one caller computing at a time.
+
+    lock_ttl should be at least as long as compute() can take; after that other
+    callers assume the owner died and compute it themselves.
+    """
+    return backend().get_or_compute(key, compute, ttl, should_store, wait, lock_ttl)
+
+
+def stats() -> dict:
+    return backend().info()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load variables from .env if present (for local development)
@@ -7,3 +8,75 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "supersecretkey")
     MONGO_URI = os.environ.get("MONGO_URI")
+
+    # Load the scan stack in a background thread at boot instead of on first scan
+    WARMUP_SCAN_STACK = os.environ.get("WARMUP_SCAN_STACK", "1") == "1"
+
+    # End-to-end latency budget per scan, in seconds (requests may ask for less)
+    SCAN_BUDGET_S = float(os.environ.get("SCAN_BUDGET_S", "8"))
+    SCAN_BUDGET_PUBLIC_S = float(os.environ.get("SCAN_BUDGET_PUBLIC_S", "5"))
+    SCAN_BUDGET_MAX_S = float(os.environ.get("SCAN_BUDGET_MAX_S", "20"))
+    LOOKUP_WORKERS = int(os.environ.get("LOOKUP_WORKERS", "8"))
+
+    # Revalidating cache of page-derived features (memory LRU + bounded disk dir)
+    PAGE_CACHE_DIR = os.environ.get(
+        "PAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fakedeploy-page-cache")
+    )
+    PAGE_CACHE_MEMORY_ENTRIES = int(os.environ.get("PAGE_CACHE_MEMORY_ENTRIES", "512"))
+    PAGE_CACHE_DISK_BYTES = int(os.environ.get("PAGE_CACHE_DISK_BYTES", str(32 * 1024 * 1024)))
+
+    # WHOIS / DNS result cache; failed lookups are kept for NEGATIVE_TTL_S only
+    WHOIS_TTL_S = int(os.environ.get("WHOIS_TTL_S", str(24 * 3600)))
+    DNS_TTL_S = int(os.environ.get("DNS_TTL_S", "3600"))
+    NEGATIVE_TTL_S = int(os.environ.get("NEGATIVE_TTL_S", "300"))
+
+    # Shared result cache: "sqlite" (one file shared by all workers on the host)
+    # or "memory" (per process). Holds scan results, predictions, WHOIS and DNS.
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+    CACHE_PATH = os.environ.get(
+        "CACHE_PATH", os.path.join(tempfile.gettempdir(), "fakedeploy-cache.sqlite3")
+    )
+    CACHE_MAX_BYTES = int(os.environ.get("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "4096"))
+    SCAN_RESULT_TTL_S = int(os.environ.get("SCAN_RESULT_TTL_S", "600"))
+    PREDICTION_TTL_S = int(os.environ.get("PREDICTION_TTL_S", "3600"))
+
+    # Background refresh of the most-queried domains
+    REFRESH_ENABLED = os.environ.get("REFRESH_ENABLED", "1") == "1"
+    REFRESH_INTERVAL_S = int(os.environ.get("REFRESH_INTERVAL_S", "300"))
+    REFRESH_WINDOW_HOURS = int(os.environ.get("REFRESH_WINDOW_HOURS", "72"))
+    REFRESH_TOP_N = int(os.environ.get("REFRESH_TOP_N", "50"))
+    REFRESH_AHEAD_S = int(os.environ.get("REFRESH_AHEAD_S", "900"))
+    REFRESH_MAX_LOOKUPS = int(os.environ.get("REFRESH_MAX_LOOKUPS", "30"))
+    # Cached pages are revalidated once they were last checked this long ago
+    REFRESH_PAGE_AFTER_S = int(os.environ.get("REFRESH_PAGE_AFTER_S", "3600"))
+    # A cycle stops starting lookups after this long; also sizes its shared-cache lock
+    REFRESH_CYCLE_MAX_S = int(os.environ.get("REFRESH_CYCLE_MAX_S", "120"))
+
+    # Request threads per gunicorn worker; keep in step with --threads in render.yaml
+    WEB_THREADS = int(os.environ.get("WEB_THREADS", "4"))
+
+    # Live query feed (server-sent events, admin-only). Each open stream holds one
+    # of the WEB_THREADS request threads for up to EVENTS_STREAM_MAX_S, so by
+    # default at most a quarter of them (at least one) can be streams.
+    EVENTS_MAX_SUBSCRIBERS = int(
+        os.environ.get("EVENTS_MAX_SUBSCRIBERS", str(max(1, WEB_THREADS // 4)))
+    )
+    EVENTS_STREAM_MAX_S = int(os.environ.get("EVENTS_STREAM_MAX_S", "300"))
+    EVENTS_TOKEN_TTL_S = int(os.environ.get("EVENTS_TOKEN_TTL_S", "60"))
+    EVENTS_BUFFER_SIZE = int(os.environ.get("EVENTS_BUFFER_SIZE", "100"))
+
+    # Sampling profiler (admin-triggered); lower = more detail, more overhead
+    PROFILER_INTERVAL_MS = int(os.environ.get("PROFILER_INTERVAL_MS", "10"))
+
+    # Responses: compress bodies at least this big when the client accepts it
+    COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+    GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+    JSON_SORT_KEYS = os.environ.get("JSON_SORT_KEYS", "0") == "1"
+
+    # Password hashing (bcrypt) — runs on a small dedicated thread pool
+    BCRYPT_LOG_ROUNDS = int(os.environ.get("BCRYPT_LOG_ROUNDS", "12"))
+    BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", "2"))
+    BCRYPT_QUEUE_SIZE = int(os.environ.get("BCRYPT_QUEUE_SIZE", "8"))
+    BCRYPT_TIMEOUT = float(os.environ.get("BCRYPT_TIMEOUT", "10"))
@@ -1,16 +1,27 @@
 from pymongo import MongoClient
 from config import Config
 
-# MongoDB connection
+# MongoDB connection (the client connects lazily; ping() is run by the warm-up)
 client = MongoClient(Config.MONGO_URI)
 
-try:
-    client.admin.command("ping")
-    print("✅ Connected to MongoDB Atlas successfully!")
-except Exception as e:
-    print("❌ MongoDB connection failed:", e)
+
+def ping():
+    try:
+        client.admin.command("ping")
+        print("✅ Connected to MongoDB Atlas successfully!")
+    except Exception as e:
+        print("❌ MongoDB connection failed:", e)
+
+
+def ensure_indexes():
+    # Serves per-user history lookups and their newest-first sort
+    try:
+        queries_collection.create_index([("username", 1), ("timestamp", -1)])
+    except Exception as e:
+        print("❌ Creating query indexes failed:", e)
+
 
 # Get database + users collection
 db = client["fakewebsite"]
 users_collection = db["users"]
-queries_collection=db["queries"]
\ No newline at end of file
+queries_collection=db["queries"]
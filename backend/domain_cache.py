@@ -0,0 +1,53 @@
+import threading
+import time
+
+import cache
+from config import Config
+
+# TTL cache for per-domain lookups (WHOIS records, DNS results), stored in the
+# shared result cache so every worker benefits from one lookup. Keys are
+# "<kind>:<domain>". refresher.py keeps the popular entries warm.
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "stores": 0}
+
+
+def _key(kind: str, domain: str) -> str:
+    return f"{kind}:{domain}"
+
+
+def peek(kind: str, domain: str):
+    """Raw entry dict (value, stored_at, expires_at, negative) without touching stats."""
+    return cache.peek(_key(kind, domain))
+
+
+def get(kind: str, domain: str):
+    entry = cache.get(_key(kind, domain))
+    with _lock:
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        if entry["expires_at"] <= time.time():
+            _stats["expired"] += 1
+            return None
+        _stats["hits"] += 1
+    return entry["value"]
+
+
+def put(kind: str, domain: str, value, ttl: float, negative: bool = False):
+    """negative=True marks a failed lookup, which the refresher leaves alone until it expires."""
+    now = time.time()
+    entry = {"value": value, "stored_at": now, "expires_at": now + ttl, "negative": negative}
+    # Kept past expires_at so the refresher can still see how overdue it is;
+    # get() treats it as gone once expires_at passes
+    cache.put(_key(kind, domain), entry, ttl + Config.REFRESH_AHEAD_S + Config.REFRESH_INTERVAL_S)
+    with _lock:
+        _stats["stores"] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot = dict(_stats)
+    lookups = snapshot["hits"] + snapshot["misses"] + snapshot["expired"]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+    return snapshot
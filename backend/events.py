@@ -0,0 +1,73 @@
+import queue
+import threading
+
+from config import Config
+
+# In-process publish/subscribe for newly logged queries. Each subscriber gets
+# a bounded buffer; a subscriber that falls behind far enough to fill it is
+# evicted rather than slowing down the request that published.
+#
+# Per worker process: a dashboard sees queries logged by the worker serving
+# its stream.
+
+
+class Subscriber:
+    def __init__(self, maxsize: int):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.evicted = False
+
+    def get(self, timeout: float):
+        """Next event, or None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TooManySubscribers(RuntimeError):
+    pass
+
+
+_lock = threading.Lock()
+_subscribers = set()
+_stats = {"published": 0, "delivered": 0, "evicted": 0}
+
+
+def subscribe() -> Subscriber:
+    with _lock:
+        if len(_subscribers) >= Config.EVENTS_MAX_SUBSCRIBERS:
+            raise TooManySubscribers("Too many live feeds open, try again later")
+        sub = Subscriber(Config.EVENTS_BUFFER_SIZE)
+        _subscribers.add(sub)
+        return sub
+
+
+def unsubscribe(sub: Subscriber):
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def publish(event: dict):
+    with _lock:
+        subs = list(_subscribers)
+        _stats["published"] += 1
+    for sub in subs:
+        try:
+            sub.queue.put_nowait(event)
+            delivered = True
+        except queue.Full:
+            delivered = False
+        with _lock:
+            if delivered:
+                _stats["delivered"] += 1
+            elif sub in _subscribers:
+                sub.evicted = True
+                _subscribers.discard(sub)
+                _stats["evicted"] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot["subscribers"] = len(_subscribers)
+    return snapshot
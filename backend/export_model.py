@@ -0,0 +1,128 @@
+"""Convert model.pkl into flat numpy arrays for tree_eval.py.
+
+Usage:
+    python export_model.py [validation.csv]
+
+The CSV (optional) needs a header with the FEATURES_IN_ORDER columns. Without
+one, a synthetic validation set is generated. The export is only written if the
+compiled evaluator gives exactly the same labels as the pickled model.
+"""
+import csv
+import pickle
+import sys
+
+import numpy as np
+
+import tree_eval
+from model_infer import MODEL_PATH, FEATURES_IN_ORDER
+
+# sklearn marks leaves with -1 children
+TREE_LEAF = -1
+
+
+def _estimators(model):
+    if hasattr(model, "tree_"):
+        return [model]
+    if hasattr(model, "estimators_") and hasattr(model, "classes_"):
+        ests = list(model.estimators_)
+        if all(hasattr(e, "tree_") for e in ests):
+            return ests
+    raise TypeError(f"Unsupported model type for export: {type(model).__name__}")
+
+
+def _leaf_proba(tree) -> np.ndarray:
+    # Same normalisation as DecisionTreeClassifier.predict_proba
+    proba = np.array(tree.value[:, 0, :], dtype=np.float64)
+    normalizer = proba.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    proba /= normalizer
+    return proba
+
+
+def compile_model(model):
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise TypeError("Only single-output classifiers can be exported")
+
+    feature, threshold, left, right, proba, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for est in _estimators(model):
+        tree = est.tree_
+        is_leaf = tree.children_left == TREE_LEAF
+        ids = np.arange(tree.node_count, dtype=np.int64) + offset
+
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        threshold.append(np.asarray(tree.threshold, dtype=np.float64))
+        left.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int64))
+        right.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int64))
+        proba.append(_leaf_proba(tree))
+        roots.append(offset)
+
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += tree.node_count
+
+    classes = np.asarray(model.classes_)
+    if classes.dtype == object:
+        classes = classes.astype(str)
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children_left": np.concatenate(left),
+        "children_right": np.concatenate(right),
+        "leaf_proba": np.concatenate(proba),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "classes": classes,
+    }
+    meta = {
+        "source": type(model).__name__,
+        "n_trees": len(roots),
+        "n_nodes": int(offset),
+        "max_depth": max_depth,
+        "n_features": int(getattr(model, "n_features_in_", len(FEATURES_IN_ORDER))),
+        "features": FEATURES_IN_ORDER,
+    }
+    return arrays, meta
+
+
+def _load_csv(path: str) -> np.ndarray:
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    return np.array([[float(r.get(k, 0) or 0) for k in FEATURES_IN_ORDER] for r in rows], dtype=float)
+
+
+def _synthetic(n: int = 5000, seed: int = 0) -> np.ndarray:
+    # Mix of the dataset's {-1, 0, 1} encoding and the raw ranges scrape.py emits
+    rng = np.random.default_rng(seed)
+    ternary = rng.integers(-1, 2, size=(n, len(FEATURES_IN_ORDER)))
+    raw = rng.integers(-1, 4000, size=(n, len(FEATURES_IN_ORDER)))
+    return np.vstack([ternary, raw]).astype(float)
+
+
+def main(argv):
+    with open(MODEL_PATH, "rb") as f:
+        model = pickle.load(f)
+
+    arrays, meta = compile_model(model)
+    # Lets model_infer notice when model.pkl is replaced after this export
+    meta["source_sha256"] = tree_eval.file_sha256(MODEL_PATH)
+    compiled = tree_eval.CompiledForest(
+        max_depth=meta["max_depth"], n_features=meta["n_features"], **arrays
+    )
+
+    X = _load_csv(argv[1]) if len(argv) > 1 else _synthetic()
+    expected = model.predict(X)
+    got = compiled.predict(X)
+    mismatches = int(np.sum(expected != got))
+    print(f"📊 Validated on {len(X)} rows: {mismatches} mismatches")
+    if mismatches:
+        print("❌ Compiled model disagrees with model.pkl, not exporting")
+        return 1
+
+    tree_eval.save(arrays, meta)
+    print(f"✅ Exported {meta['n_trees']} trees ({meta['n_nodes']} nodes) to {tree_eval.TREES_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
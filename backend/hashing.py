@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask_bcrypt import Bcrypt
+from config import Config
+
+# bcrypt releases the GIL while hashing, so a small dedicated pool keeps the
+# expensive work off the request threads and caps how many run at once.
+bcrypt = Bcrypt()
+
+_executor = ThreadPoolExecutor(
+    max_workers=Config.BCRYPT_WORKERS, thread_name_prefix="bcrypt"
+)
+# Running + waiting jobs; anything beyond this is rejected instead of queued
+_slots = threading.BoundedSemaphore(Config.BCRYPT_WORKERS + Config.BCRYPT_QUEUE_SIZE)
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the hashing pool is saturated or a job timed out."""
+
+
+# ---------------- Metrics ---------------- #
+
+_SAMPLE_WINDOW = 512
+_metrics_lock = threading.Lock()
+_metrics = {
+    "hash_calls": 0,
+    "check_calls": 0,
+    "rehashes": 0,
+    "rejected": 0,
+    "timeouts": 0,
+    "in_flight": 0,
+}
+_hash_seconds = deque(maxlen=_SAMPLE_WINDOW)
+_queue_seconds = deque(maxlen=_SAMPLE_WINDOW)
+
+
+def _bump(key: str, delta: int = 1):
+    with _metrics_lock:
+        _metrics[key] += delta
+
+
+def _percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _summary(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(_percentile(samples, 95) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
+
+
+def metrics() -> dict:
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+        hash_samples = list(_hash_seconds)
+        queue_samples = list(_queue_seconds)
+    snapshot.update({
+        "log_rounds": Config.BCRYPT_LOG_ROUNDS,
+        "workers": Config.BCRYPT_WORKERS,
+        "queue_size": Config.BCRYPT_QUEUE_SIZE,
+        "hash_latency": _summary(hash_samples),
+        "queue_wait": _summary(queue_samples),
+    })
+    return snapshot
+
+
+# ---------------- Executor ---------------- #
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        _bump("rejected")
+        raise HashingBusy("Password hashing is busy, try again shortly")
+
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with _metrics_lock:
+                _queue_seconds.append(started - submitted)
+                _hash_seconds.append(finished - started)
+
+    def release(_future=None):
+        _slots.release()
+        _bump("in_flight", -1)
+
+    _bump("in_flight")
+    try:
+        future = _executor.submit(job)
+    except Exception:
+        release()
+        raise
+    future.add_done_callback(release)
+
+    try:
+        return future.result(timeout=Config.BCRYPT_TIMEOUT)
+    except FutureTimeout:
+        _bump("timeouts")
+        raise HashingBusy("Password hashing timed out")
+
+
+def hash_password(password: str) -> str:
+    _bump("hash_calls")
+    return _run(
+        bcrypt.generate_password_hash, password, Config.BCRYPT_LOG_ROUNDS
+    ).decode("utf-8")
+
+
+def check_password(pw_hash: str, password: str) -> bool:
+    _bump("check_calls")
+    return _run(bcrypt.check_password_hash, pw_hash, password)
+
+
+def hash_rounds(pw_hash: str) -> int:
+    # bcrypt hashes look like $2b$12$<salt+digest>
+    try:
+        return int(pw_hash.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return -1
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    return hash_rounds(pw_hash) != Config.BCRYPT_LOG_ROUNDS
+
+
+def rehash_if_needed(users_collection, username: str, pw_hash: str, password: str):
+    """After a successful login, upgrade a hash made with a different cost factor."""
+    if not needs_rehash(pw_hash):
+        return
+    try:
+        new_hash = hash_password(password)
+    except HashingBusy:
+        # Not worth failing a good login over; we'll try again next time
+        return
+    users_collection.update_one(
+        {"username": username, "password": pw_hash},
+        {"$set": {"password": new_hash}}
+    )
+    _bump("rehashes")
@@ -4,6 +4,8 @@ from typing import Dict, List
 
 import numpy as np
 
+import tree_eval
+
 # Adjust this path if you place the model elsewhere
 MODEL_PATH = os.path.join(os.path.dirname(__file__), "model.pkl")
 
@@ -49,8 +51,24 @@ def _load_pickle(path: str):
     with open(path, "rb") as f:
         return pickle.load(f)
 
+def _export_is_current() -> bool:
+    """The numpy export is usable unless model.pkl exists and isn't what it was made from."""
+    if not tree_eval.exists():
+        return False
+    if not os.path.exists(MODEL_PATH):
+        return True
+    if tree_eval.source_sha256() == tree_eval.file_sha256(MODEL_PATH):
+        return True
+    print("⚠️ model_trees/ was exported from a different model.pkl; using the pickle. "
+          "Re-run export_model.py to refresh it.")
+    return False
+
 try:
-    if os.path.exists(MODEL_PATH):
+    # Prefer the numpy-only export (see export_model.py); the pickle pulls in sklearn
+    if _export_is_current():
+        _model = tree_eval.load()
+        print("✅ Compiled tree model loaded successfully!")
+    elif os.path.exists(MODEL_PATH):
         _model = _load_pickle(MODEL_PATH)
         print("✅ Model loaded successfully!")
     else:
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config import Config
+
+# Cache of HTML-derived features keyed by requested URL, with the validators
+# (ETag / Last-Modified) needed to revalidate. A 304 means we can reuse the
+# features without downloading or parsing the page again.
+#
+# Two tiers: an in-process LRU bounded by entry count, and a directory of small
+# JSON files bounded by total bytes (oldest files are evicted first). The
+# directory is scanned for the size check every TRIM_EVERY writes, not per write.
+
+TRIM_EVERY = 50
+
+_lock = threading.Lock()
+_memory = OrderedDict()
+_writes = 0
+_stats = {"hits": 0, "misses": 0, "revalidated": 0, "changed": 0, "stores": 0, "evictions": 0}
+
+
+def _bump(key: str, delta: int = 1):
+    with _lock:
+        _stats[key] += delta
+
+
+def _path(url: str) -> str:
+    return os.path.join(Config.PAGE_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def _remember(url: str, entry: dict):
+    with _lock:
+        _memory[url] = entry
+        _memory.move_to_end(url)
+        while len(_memory) > Config.PAGE_CACHE_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def _read_disk(url: str):
+    try:
+        with open(_path(url)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("url") == url else None
+
+
+def _write_disk(url: str, entry: dict):
+    global _writes
+    try:
+        os.makedirs(Config.PAGE_CACHE_DIR, exist_ok=True)
+        path = _path(url)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+        with _lock:
+            _writes += 1
+            trim = _writes % TRIM_EVERY == 0
+        if trim:
+            _trim_disk()
+    except OSError as e:
+        print(f"❌ Page cache write failed: {e}")
+
+
+def _trim_disk():
+    files = []
+    total = 0
+    with os.scandir(Config.PAGE_CACHE_DIR) as it:
+        for f in it:
+            if f.name.endswith(".json"):
+                st = f.stat()
+                files.append((st.st_mtime, st.st_size, f.path))
+                total += st.st_size
+    if total <= Config.PAGE_CACHE_DISK_BYTES:
+        return
+    files.sort()
+    for _mtime, size, path in files:
+        if total <= Config.PAGE_CACHE_DISK_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            _bump("evictions")
+        except OSError:
+            pass
+
+
+def get(url: str):
+    with _lock:
+        entry = _memory.get(url)
+        if entry is not None:
+            _memory.move_to_end(url)
+    if entry is None:
+        entry = _read_disk(url)
+        if entry is not None:
+            _remember(url, entry)
+    _bump("hits" if entry is not None else "misses")
+    return entry
+
+
+def peek(url: str):
+    """Cached entry without touching stats or LRU order."""
+    with _lock:
+        entry = _memory.get(url)
+    if entry is not None:
+        return entry
+    entry = _read_disk(url)
+    if entry is not None:
+        # revalidated() only touches the file, so its mtime is the last check
+        try:
+            entry["checked_at"] = max(entry.get("checked_at", 0), os.path.getmtime(_path(url)))
+        except OSError:
+            pass
+    return entry
+
+
+def conditional_headers(entry) -> dict:
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def revalidated(url: str, entry: dict):
+    """The origin answered 304: bump the entry so it isn't evicted first."""
+    _bump("revalidated")
+    entry = dict(entry, checked_at=time.time())
+    _remember(url, entry)
+    try:
+        os.utime(_path(url))
+    except OSError:
+        pass
+
+
+def put(url: str, final_url: str, headers, redirects: int, features: dict, changed: bool = False):
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    if not etag and not last_modified:
+        # Nothing to revalidate with, so caching it would never save a download
+        return
+    entry = {
+        "url": url,
+        "final_url": final_url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "redirects": redirects,
+        "features": features,
+        "stored_at": time.time(),
+        "checked_at": time.time(),
+    }
+    _remember(url, entry)
+    _write_disk(url, entry)
+    _bump("stores")
+    if changed:
+        _bump("changed")
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot = dict(_stats)
+        snapshot["memory_entries"] = len(_memory)
+    lookups = snapshot["hits"] + snapshot["misses"]
+    snapshot["revalidation_rate"] = round(snapshot["revalidated"] / lookups, 4) if lookups else 0.0
+    return snapshot
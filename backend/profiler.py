@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from config import Config
+
+# On-demand sampling profiler. While a session is running, a background thread
+# wakes every PROFILER_INTERVAL_MS, grabs the current stack of each request
+# thread whose path matched the session's prefix, and counts identical stacks.
+# Pool jobs wrapped with bind() are sampled under the request that submitted
+# them, so lookups show up beneath their scan and idle pool threads don't. The result is the "collapsed stack" format that
+# flamegraph.pl / speedscope read: "frame;frame;frame count" per line.
+#
+# Only the worker process that received the start request is profiled.
+
+MAX_SECONDS = 300
+
+_lock = threading.Lock()
+_tracked = {}
+_stacks = Counter()
+_session = {
+    "active": False,
+    "path_prefix": None,
+    "started_at": None,
+    "ends_at": None,
+    "samples": 0,
+    "overhead_ms": 0.0,
+}
+_thread = None
+# Bumped by every start(); a sampler thread only acts while it still owns the
+# current generation, so one left over from a stopped session can't touch the next
+_generation = 0
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame, root: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def _sample_once(generation: int):
+    me = threading.get_ident()
+    with _lock:
+        tracked = dict(_tracked)
+    found = []
+    for ident, frame in sys._current_frames().items():
+        if ident != me and ident in tracked:
+            found.append(_collapse(frame, tracked[ident]))
+    with _lock:
+        if generation != _generation:
+            return
+        _stacks.update(found)
+        _session["samples"] += 1
+
+
+def _run(interval: float, generation: int):
+    while True:
+        with _lock:
+            if generation != _generation:
+                return
+            if not _session["active"] or time.time() >= _session["ends_at"]:
+                _session["active"] = False
+                _tracked.clear()
+                return
+        started = time.perf_counter()
+        _sample_once(generation)
+        spent = time.perf_counter() - started
+        with _lock:
+            if generation == _generation:
+                _session["overhead_ms"] += spent * 1000
+        time.sleep(max(0.0, interval - spent))
+
+
+def start(seconds: float, path_prefix: str = "/api/query/"):
+    """Start a session; raises ProfilerBusy if one is already running."""
+    global _thread, _generation
+    seconds = min(max(float(seconds), 1.0), MAX_SECONDS)
+    with _lock:
+        if _session["active"]:
+            raise ProfilerBusy("A profiling session is already running")
+        _generation += 1
+        _stacks.clear()
+        _tracked.clear()
+        now = time.time()
+        _session.update({
+            "active": True,
+            "path_prefix": path_prefix,
+            "started_at": now,
+            "ends_at": now + seconds,
+            "samples": 0,
+            "overhead_ms": 0.0,
+        })
+        _thread = threading.Thread(
+            target=_run, args=(Config.PROFILER_INTERVAL_MS / 1000.0, _generation),
+            name="profiler", daemon=True
+        )
+        _thread.start()
+    return status()
+
+
+def stop():
+    with _lock:
+        _session["active"] = False
+    return status()
+
+
+def request_started(path: str):
+    # Called for every request, so keep the inactive case to a single check
+    if not _session["active"]:
+        return
+    with _lock:
+        prefix = _session["path_prefix"]
+        if _session["active"] and (not prefix or path.startswith(prefix)):
+            _tracked[threading.get_ident()] = f"[{path}]"
+
+
+def request_finished():
+    if not _tracked:
+        return
+    with _lock:
+        _tracked.pop(threading.get_ident(), None)
+
+
+def bind(fn):
+    """Wrap a job for a worker pool so that, while it runs, it is sampled under
+    the request submitting it. Returns fn unchanged if that request isn't tracked."""
+    if not _session["active"]:
+        return fn
+    with _lock:
+        label = _tracked.get(threading.get_ident())
+        generation = _generation
+    if label is None:
+        return fn
+    root = label + ";[lookup pool]"
+
+    @wraps(fn)
+    def job(*args, **kwargs):
+        ident = threading.get_ident()
+        with _lock:
+            if generation == _generation:
+                _tracked[ident] = root
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with _lock:
+                if _tracked.get(ident) == root:
+                    del _tracked[ident]
+    return job
+
+
+def status() -> dict:
+    with _lock:
+        snapshot = dict(_session)
+        snapshot["distinct_stacks"] = len(_stacks)
+        snapshot["interval_ms"] = Config.PROFILER_INTERVAL_MS
+    return snapshot
+
+
+def collapsed() -> str:
+    with _lock:
+        items = sorted(_stacks.items())
+    return "".join(f"{stack} {count}\n" for stack, count in items)
@@ -0,0 +1,175 @@
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from config import Config
+import cache
+import domain_cache
+import page_cache
+
+# Keeps the most-queried sites warm: every REFRESH_INTERVAL_S it reads recent
+# query history, ranks sites by how often they were checked, and re-fetches
+# WHOIS / DNS entries that are missing or within REFRESH_AHEAD_S of expiring.
+# Failed lookups (cached for NEGATIVE_TTL_S) are only retried once they have
+# expired, so dead domains don't eat the budget. Whatever budget is left then
+# goes to revalidating cached pages last checked over REFRESH_PAGE_AFTER_S ago;
+# pages that aren't cached are left for the next scan to fetch.
+#
+# At most REFRESH_MAX_LOOKUPS outbound lookups per cycle. With the sqlite cache
+# backend that holds across all workers on the host (one runs the cycle, the
+# rest reuse it); with CACHE_BACKEND=memory every worker runs its own cycle.
+# Lookups run on the scan pool and a cycle gives up on them after
+# REFRESH_CYCLE_MAX_S, so it can't outlive the lock that keeps it host-wide.
+
+_lock = threading.Lock()
+_thread = None
+_stop = threading.Event()
+_state = {
+    "cycles": 0,
+    "last_cycle_at": None,
+    "last_cycle_ms": None,
+    "last_lookups": 0,
+    "last_skipped_for_budget": 0,
+    "hot_sites": 0,
+    "coverage": None,
+    "refresh_lag_avg_s": None,
+    "refresh_lag_max_s": None,
+    "last_error": None,
+}
+
+
+def hot_sites(limit: int = None, window_hours: int = None) -> list:
+    """[(website, count)] from queries_collection, most popular first."""
+    from db import queries_collection
+
+    limit = limit or Config.REFRESH_TOP_N
+    window_hours = window_hours or Config.REFRESH_WINDOW_HOURS
+    # Timestamps are stored as ISO strings, which sort chronologically
+    since = (datetime.utcnow() - timedelta(hours=window_hours)).isoformat()
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": since}}},
+        {"$group": {"_id": "$website", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    return [(doc["_id"], doc["count"]) for doc in queries_collection.aggregate(pipeline) if doc["_id"]]
+
+
+def _due(kind: str, domain: str, now: float):
+    """None if fresh enough, else how long (s) the entry has been due for refresh."""
+    entry = domain_cache.peek(kind, domain)
+    if entry is None:
+        return 0.0
+    ahead = 0 if entry.get("negative") else Config.REFRESH_AHEAD_S
+    due_at = entry["expires_at"] - ahead
+    return None if due_at > now else now - due_at
+
+
+def _fresh(kind: str, domain: str, now: float) -> bool:
+    entry = domain_cache.peek(kind, domain)
+    return entry is not None and entry["expires_at"] > now
+
+
+def _call(fn, *args, ends_at: float, **kwargs) -> bool:
+    """Run a lookup on the scan pool; False if the cycle ran out of time first."""
+    import scrape
+
+    future = scrape.submit_lookup(fn, *args, **kwargs)
+    try:
+        future.result(timeout=max(0.0, ends_at - time.monotonic()))
+        return True
+    except FutureTimeout:
+        future.cancel()
+        return False
+
+
+def run_cycle() -> dict:
+    import scrape
+
+    started = time.time()
+    ends_at = time.monotonic() + Config.REFRESH_CYCLE_MAX_S
+    sites = [(website, urlparse(website).netloc) for website, _count in hot_sites()]
+    sites = [(website, domain) for website, domain in sites if domain]
+    budget = Config.REFRESH_MAX_LOOKUPS
+    lookups, skipped, lags = 0, 0, []
+
+    # Due WHOIS / DNS entries across the whole list come first...
+    for _website, domain in sites:
+        for kind, lookup in (("whois", scrape.whois_record), ("dns", scrape.dns_lookup)):
+            lag = _due(kind, domain, time.time())
+            if lag is None:
+                continue
+            if lookups >= budget or time.monotonic() >= ends_at:
+                skipped += 1
+                continue
+            lookups += 1
+            if _call(lookup, domain, refresh=True, ends_at=ends_at):
+                lags.append(lag)
+
+    # ...then stale cached pages, with a conditional GET (a 304 costs no
+    # download or parse)
+    for website, domain in sites:
+        entry = page_cache.peek(website)
+        if entry is None or entry.get("checked_at", 0) > time.time() - Config.REFRESH_PAGE_AFTER_S:
+            continue
+        if lookups >= budget or time.monotonic() >= ends_at:
+            skipped += 1
+            continue
+        lookups += 1
+        _call(scrape.fetch_page_features, website, domain, ends_at=ends_at)
+
+    now = time.time()
+    domains = [domain for _website, domain in sites]
+    covered = sum(1 for d in domains if _fresh("whois", d, now) and _fresh("dns", d, now))
+    with _lock:
+        _state.update({
+            "cycles": _state["cycles"] + 1,
+            "last_cycle_at": datetime.utcnow().isoformat(),
+            "last_cycle_ms": int((now - started) * 1000),
+            "last_lookups": lookups,
+            "last_skipped_for_budget": skipped,
+            "hot_sites": len(domains),
+            "coverage": round(covered / len(domains), 4) if domains else None,
+            "refresh_lag_avg_s": round(sum(lags) / len(lags), 1) if lags else 0.0,
+            "refresh_lag_max_s": round(max(lags), 1) if lags else 0.0,
+            "last_error": None,
+        })
+        return dict(_state)
+
+
+def _loop():
+    while not _stop.is_set():
+        try:
+            # Every worker runs this loop; the shared cache lets one of them do
+            # the cycle while the others wait for and reuse its result.
+            result = cache.get_or_compute(
+                "refresher:last_cycle", run_cycle, Config.REFRESH_INTERVAL_S * 0.9,
+                wait=Config.REFRESH_INTERVAL_S,
+                # The cycle stops starting lookups at REFRESH_CYCLE_MAX_S; the
+                # margin covers the coverage pass afterwards
+                lock_ttl=Config.REFRESH_CYCLE_MAX_S + 60,
+            )
+            with _lock:
+                _state.update(result)
+        except Exception as e:
+            with _lock:
+                _state["last_error"] = str(e)
+            print(f"❌ Refresh cycle failed: {e}")
+        _stop.wait(Config.REFRESH_INTERVAL_S)
+
+
+def start():
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_loop, name="refresher", daemon=True)
+            _thread.start()
+
+
+def stats() -> dict:
+    with _lock:
+        snapshot = dict(_state)
+    snapshot["running"] = _thread is not None and _thread.is_alive()
+    return snapshot
@@ -0,0 +1,100 @@
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+# Response layer: faster JSON encoding (orjson when installed), gzip/brotli
+# compression for large bodies when the client accepts it, and a compact form
+# for scan/prediction payloads.
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the dumping."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+COMPRESSIBLE = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+
+def _pick_encoding(accept_encoding) -> str:
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < Config.COMPRESS_MIN_BYTES:
+        return response
+    encoding = _pick_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if encoding == "br":
+        body = brotli.compress(body, quality=Config.BROTLI_QUALITY)
+    else:
+        body = gzip.compress(body, compresslevel=Config.GZIP_LEVEL)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    # The compressed bytes differ from the identity ones
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    # Flask's default sorts keys; dropping that saves time on big admin lists
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+    app.json.sort_keys = Config.JSON_SORT_KEYS
+    app.after_request(compress_response)
+
+
+# ---------------- Compact scan payloads ---------------- #
+
+def wants_compact(data: dict) -> bool:
+    flag = request.args.get("compact", data.get("compact"))
+    return str(flag).lower() in ("1", "true", "yes")
+
+
+def scan_payload(url: str, feats: dict, completeness: dict, compact: bool) -> dict:
+    """Response body for extract/predict. Compact mode sends the features as an
+    array in FEATURES_IN_ORDER and drops the derivable `measured` list."""
+    if not compact:
+        return {"website": url, "features": feats, "completeness": completeness}
+    from model_infer import FEATURES_IN_ORDER
+    completeness = {k: v for k, v in completeness.items() if k != "measured"}
+    return {
+        "website": url,
+        "features": [feats.get(k, 0) for k in FEATURES_IN_ORDER],
+        "completeness": completeness,
+    }
@@ -1,17 +1,59 @@
-from flask import Blueprint, request, jsonify
-from flask_bcrypt import Bcrypt
+import hashlib
+import math
+import json
+from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from db import users_collection, queries_collection
-from scrape import extract_features
-from model_infer import predict as model_predict
 from datetime import datetime
 from bson.timestamp import Timestamp
+from config import Config
+import events
+from responses import scan_payload, wants_compact
+from hashing import HashingBusy, hash_password, check_password, rehash_if_needed
 auth_bp = Blueprint("auth", __name__)
 query_bp = Blueprint("query", __name__)
-bcrypt = Bcrypt()
 
 ADMIN_USERNAMES = ["admin1", "admin2"]
 
+# The scan stack (requests/bs4/whois/numpy + the model) is heavy to import, so
+# it's loaded on first use or by the warm-up thread, not when this module loads.
+def scan(url: str, budget: float = None):
+    """Returns (features, completeness) — see scrape.extract_features_within."""
+    from scrape import extract_features_within
+    return extract_features_within(url, budget)
+
+
+def model_predict(features: dict) -> int:
+    from model_infer import predict, FEATURES_IN_ORDER
+    import cache
+
+    # Same feature vector, same label — shared across workers
+    key = "predict:" + hashlib.sha1(
+        json.dumps([features.get(k, 0) for k in FEATURES_IN_ORDER], default=str).encode("utf-8")
+    ).hexdigest()
+    return cache.get_or_compute(key, lambda: predict(features), Config.PREDICTION_TTL_S)
+
+
+def scan_budget(data: dict, default: float) -> float:
+    """Endpoint default, or the client's `budget_ms` capped at SCAN_BUDGET_MAX_S."""
+    requested = data.get("budget_ms")
+    if requested is None:
+        return default
+    try:
+        budget = float(requested) / 1000.0
+    except (TypeError, ValueError):
+        return default
+    if not math.isfinite(budget):
+        return default
+    return min(max(budget, 0.1), Config.SCAN_BUDGET_MAX_S)
+
+
+def log_query(query_doc: dict):
+    """Store a query and push it to live admin feeds."""
+    queries_collection.insert_one(query_doc)
+    query_doc.pop("_id", None)  # added by insert_one, not JSON-serialisable
+    events.publish(query_doc)
+
 # ---------------- AUTH ---------------- #
 
 @auth_bp.route("/signup", methods=["POST"])
@@ -29,7 +71,10 @@ def signup():
         return jsonify({"error": "User already exists"}), 400
 
     role = "admin" if username in ADMIN_USERNAMES else "user"
-    hashed_pw = bcrypt.generate_password_hash(password).decode("utf-8")
+    try:
+        hashed_pw = hash_password(password)
+    except HashingBusy as e:
+        return jsonify({"error": str(e)}), 503
 
     users_collection.insert_one({
         "fullname": fullname,
@@ -52,8 +97,16 @@ def login():
         return jsonify({"error": "Username and password are required"}), 400
 
     user = users_collection.find_one({"username": username})
-    if not user or not bcrypt.check_password_hash(user["password"], password):
+    if not user:
         return jsonify({"error": "Invalid credentials"}), 401
+    try:
+        if not check_password(user["password"], password):
+            return jsonify({"error": "Invalid credentials"}), 401
+    except HashingBusy as e:
+        return jsonify({"error": str(e)}), 503
+
+    # Cost factor changed since this hash was made? Upgrade it transparently.
+    rehash_if_needed(users_collection, username, user["password"], password)
 
     # ✅ Create JWT token (identity as dict)
     token = create_access_token(identity=username)
@@ -125,10 +178,13 @@ def update_password():
         return jsonify({"error": "User not found"}), 404
 
     # Stored bcrypt hash is in user["password"]
-    if not bcrypt.check_password_hash(user["password"], current):
-        return jsonify({"error": 'Current password is incorrect'}), 400
+    try:
+        if not check_password(user["password"], current):
+            return jsonify({"error": 'Current password is incorrect'}), 400
+        new_hash = hash_password(new)
+    except HashingBusy as e:
+        return jsonify({"error": str(e)}), 503
 
-    new_hash = bcrypt.generate_password_hash(new).decode('utf-8')
     users_collection.update_one({"username": username}, {"$set": {"password": new_hash}})
 
     return jsonify({"message": 'Password updated'}), 200
@@ -160,28 +216,84 @@ def add_query():
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    queries_collection.insert_one(query_doc)
+    log_query(query_doc)
     return jsonify({"message": "Query added successfully"}), 201
 
+MAX_HISTORY_PAGE = 500
+
+
 @query_bp.route("/user", methods=["GET"])
 @jwt_required()
 def get_user_queries():
+    """Newest-first history.
+
+    Optional query params: `since` (only entries newer than this timestamp),
+    `before` (only older ones, for paging back) and `limit`. X-Cursor holds the
+    newest timestamp to use as the next `since`; X-Next-Before is set when more
+    pages remain. Responses carry an ETag, and If-None-Match gets a 304 when
+    nothing changed.
+    """
     username = get_jwt_identity()
-
-    user_queries = list(queries_collection.find(
-        {"username": username}, {"_id": 0}
-    ).sort("timestamp", -1))
-
-    # ✅ Convert MongoDB timestamps to string
-    for q in user_queries:
-        if "timestamp" in q:
-            ts = q["timestamp"]
-            if isinstance(ts, Timestamp):
-                q["timestamp"] = datetime.fromtimestamp(ts.time).strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                q["timestamp"] = str(ts)
-
-    return jsonify(user_queries), 200
+    since = request.args.get("since")
+    before = request.args.get("before")
+    limit = request.args.get("limit", type=int)
+    if limit is not None:
+        limit = min(max(limit, 1), MAX_HISTORY_PAGE)
+
+    # Validator from the (username, timestamp) index, no collection scan
+    count = queries_collection.count_documents({"username": username})
+    # Cursor from ISO-string timestamps only: legacy BSON Timestamp docs sort
+    # after strings and wouldn't work as a `since` value
+    newest = queries_collection.find_one(
+        {"username": username, "timestamp": {"$type": "string"}},
+        {"_id": 0, "timestamp": 1}, sort=[("timestamp", -1)]
+    )
+    cursor_ts = str((newest or {}).get("timestamp", ""))
+    etag = hashlib.sha1(
+        f"{username}|{count}|{cursor_ts}|{since}|{before}|{limit}".encode("utf-8")
+    ).hexdigest()
+
+    # Always weak: the body may be sent gzip/brotli-encoded or not, and a 304
+    # must carry the same validator as the 200 it stands in for
+    if request.if_none_match.contains_weak(etag):
+        resp = make_response("", 304)
+    else:
+        query = {"username": username}
+        bounds = {}
+        if since:
+            bounds["$gt"] = since
+        if before:
+            bounds["$lt"] = before
+        if bounds:
+            query["timestamp"] = bounds
+
+        found = queries_collection.find(query, {"_id": 0}).sort("timestamp", -1)
+        if limit is not None:
+            found = found.limit(limit + 1)
+        user_queries = list(found)
+
+        next_before = None
+        if limit is not None and len(user_queries) > limit:
+            user_queries = user_queries[:limit]
+            next_before = str(user_queries[-1].get("timestamp", ""))
+
+        # ✅ Convert MongoDB timestamps to string
+        for q in user_queries:
+            if "timestamp" in q:
+                ts = q["timestamp"]
+                if isinstance(ts, Timestamp):
+                    q["timestamp"] = datetime.fromtimestamp(ts.time).strftime("%Y-%m-%d %H:%M:%S")
+                else:
+                    q["timestamp"] = str(ts)
+
+        resp = make_response(jsonify(user_queries), 200)
+        if next_before:
+            resp.headers["X-Next-Before"] = next_before
+
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    resp.headers["X-Cursor"] = cursor_ts
+    return resp
 
 @query_bp.route("/add_public", methods=["POST"])
 def add_query_public():
@@ -200,7 +312,7 @@ def add_query_public():
         "timestamp": datetime.utcnow().isoformat()
     }
 
-    queries_collection.insert_one(query_doc)
+    log_query(query_doc)
     return jsonify({"message": "Query added successfully (guest)"}), 201
 
 # ---------------- FEATURE EXTRACTION ---------------- #
@@ -213,11 +325,8 @@ def extract_for_user():
         url = data.get("website") or data.get("url")
         if not url:
             return jsonify({"error": "Missing website/url"}), 400
-        feats = extract_features(url)
-        return jsonify({
-            "website": url,
-            "features": feats
-        }), 200
+        feats, completeness = scan(url, scan_budget(data, Config.SCAN_BUDGET_S))
+        return jsonify(scan_payload(url, feats, completeness, wants_compact(data))), 200
     except Exception as e:
         return jsonify({"error": "Feature extraction failed", "details": str(e)}), 500
 
@@ -232,7 +341,7 @@ def predict_for_user():
         url = data.get("website") or data.get("url")
         if not url:
             return jsonify({"error": "Missing website/url"}), 400
-        feats = extract_features(url)
+        feats, completeness = scan(url, scan_budget(data, Config.SCAN_BUDGET_S))
         label = model_predict(feats)  # 0 or 1
         result = "Fake" if int(label) == 1 else "Legit"
         # Optionally log
@@ -240,19 +349,16 @@ def predict_for_user():
         username = identity.get("username") if isinstance(identity, dict) else identity
         if username:
             user = users_collection.find_one({"username": username}, {"_id": 0})
-            queries_collection.insert_one({
+            log_query({
                 "username": username,
                 "fullname": (user or {}).get("fullname", ""),
                 "website": url,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat()
             })
-        return jsonify({
-            "website": url,
-            "features": feats,
-            "label": int(label),
-            "result": result
-        }), 200
+        payload = scan_payload(url, feats, completeness, wants_compact(data))
+        payload.update({"label": int(label), "result": result})
+        return jsonify(payload), 200
     except Exception as e:
         return jsonify({"error": "Prediction failed", "details": str(e)}), 500
 
@@ -264,15 +370,12 @@ def predict_public():
         url = data.get("website") or data.get("url")
         if not url:
             return jsonify({"error": "Missing website/url"}), 400
-        feats = extract_features(url)
+        feats, completeness = scan(url, scan_budget(data, Config.SCAN_BUDGET_PUBLIC_S))
         label = model_predict(feats)
         result = "Fake" if int(label) == 1 else "Legit"
-        return jsonify({
-            "website": url,
-            "features": feats,
-            "label": int(label),
-            "result": result
-        }), 200
+        payload = scan_payload(url, feats, completeness, wants_compact(data))
+        payload.update({"label": int(label), "result": result})
+        return jsonify(payload), 200
     except Exception as e:
         return jsonify({"error": "Prediction failed", "details": str(e)}), 500
 
@@ -284,10 +387,7 @@ def extract_public():
         url = data.get("website") or data.get("url")
         if not url:
             return jsonify({"error": "Missing website/url"}), 400
-        feats = extract_features(url)
-        return jsonify({
-            "website": url,
-            "features": feats
-        }), 200
+        feats, completeness = scan(url, scan_budget(data, Config.SCAN_BUDGET_PUBLIC_S))
+        return jsonify(scan_payload(url, feats, completeness, wants_compact(data))), 200
     except Exception as e:
         return jsonify({"error": "Feature extraction failed", "details": str(e)}), 500
@@ -1,9 +1,77 @@
-from flask import Blueprint, jsonify,request
+import json
+import time
+from functools import wraps
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from config import Config
 from db import users_collection, queries_collection
+import events
+import profiler
 from bson.timestamp import Timestamp
 from datetime import datetime
 protected_bp = Blueprint("protected", __name__)
 
+
+# EventSource can't send an Authorization header, so live streams take a
+# short-lived, stream-only token in the query string instead. It is signed
+# separately from JWTs and can't be used as a bearer token elsewhere.
+_stream_tokens = URLSafeTimedSerializer(Config.SECRET_KEY, salt="query-stream")
+
+
+def issue_stream_token(username: str) -> str:
+    return _stream_tokens.dumps(username)
+
+
+def _stream_token_user():
+    try:
+        return _stream_tokens.loads(
+            request.args.get("token", ""), max_age=Config.EVENTS_TOKEN_TTL_S
+        )
+    except BadSignature:  # also covers expired tokens
+        return None
+
+
+def _is_admin(username) -> bool:
+    if not username:
+        return False
+    user = users_collection.find_one({"username": username}, {"_id": 0, "role": 1})
+    return bool(user) and user.get("role") == "admin"
+
+
+def _jwt_admin(view):
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        identity = get_jwt_identity()
+        username = identity.get("username") if isinstance(identity, dict) else identity
+        if not _is_admin(username):
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _stream_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        username = _stream_token_user()
+        if username is None:
+            return jsonify({"error": "Invalid or expired stream token"}), 401
+        if not _is_admin(username):
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def admin_required(fn=None, *, from_stream_token=False):
+    """JWT required, and the user's stored role must be admin.
+
+    With from_stream_token=True the identity comes from a `?token=` stream
+    token (see issue_stream_token) instead of the Authorization header.
+    """
+    decorate = _stream_admin if from_stream_token else _jwt_admin
+    return decorate(fn) if fn is not None else decorate
+
 @protected_bp.route("/users", methods=["GET"])
 def get_all_users():
     users = list(users_collection.find({}, {"_id": 0, "password": 0}))
@@ -39,4 +107,90 @@ def get_all_queries():
                 q["timestamp"] = datetime.fromtimestamp(ts.time).strftime("%Y-%m-%d %H:%M:%S")
             else:
                 q["timestamp"] = str(ts)
-    return jsonify(queries), 200
\ No newline at end of file
+    return jsonify(queries), 200
+
+@protected_bp.route("/queries/stream-token", methods=["POST"])
+@admin_required
+def stream_token():
+    identity = get_jwt_identity()
+    username = identity.get("username") if isinstance(identity, dict) else identity
+    return jsonify({
+        "token": issue_stream_token(username),
+        "expires_in": Config.EVENTS_TOKEN_TTL_S
+    }), 200
+
+@protected_bp.route("/queries/stream", methods=["GET"])
+@admin_required(from_stream_token=True)
+def stream_queries():
+    """Server-sent events: one `data:` line per newly logged query.
+
+    Each stream ends after EVENTS_STREAM_MAX_S with an `expired` event so no
+    client holds a request thread indefinitely; clients fetch a new token and
+    reconnect.
+    """
+    try:
+        sub = events.subscribe()
+    except events.TooManySubscribers as e:
+        return jsonify({"error": str(e)}), 503
+
+    def generate():
+        ends_at = time.monotonic() + Config.EVENTS_STREAM_MAX_S
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                remaining = ends_at - time.monotonic()
+                if remaining <= 0:
+                    yield "event: expired\ndata: {}\n\n"
+                    return
+                event = sub.get(timeout=min(15, remaining))
+                if event is not None:
+                    yield f"data: {json.dumps(event, default=str)}\n\n"
+                elif sub.evicted:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            events.unsubscribe(sub)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---------------- PROFILER ---------------- #
+
+@protected_bp.route("/profiler/start", methods=["POST"])
+@admin_required
+def start_profiler():
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get("seconds", 30))
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds must be a number"}), 400
+    try:
+        status = profiler.start(seconds, data.get("path", "/api/query/"))
+    except profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(status), 202
+
+@protected_bp.route("/profiler/stop", methods=["POST"])
+@admin_required
+def stop_profiler():
+    return jsonify(profiler.stop()), 200
+
+@protected_bp.route("/profiler", methods=["GET"])
+@admin_required
+def profiler_status():
+    return jsonify(profiler.status()), 200
+
+@protected_bp.route("/profiler/collapsed", methods=["GET"])
+@admin_required
+def profiler_collapsed():
+    """Collapsed stacks for flamegraph.pl / speedscope."""
+    return Response(
+        profiler.collapsed(),
+        mimetype="text/plain",
+        headers={"Content-Disposition": "attachment; filename=profile.collapsed"}
+    )
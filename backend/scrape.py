@@ -1,11 +1,19 @@
 import re
 import socket
+import time
 import requests
 import whois
 from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from urllib.parse import urlparse
 from datetime import datetime
+from types import SimpleNamespace
 import warnings
+from config import Config
+import profiler
+import page_cache
+import domain_cache
+import cache
 
 # Suppress XML warnings
 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
@@ -239,25 +247,328 @@ def statistical_report(url: str) -> int:
     return 0
 
 
-def fetch_page(url: str):
+# -------- Latency Budget -------- #
+
+class Deadline:
+    """End-to-end time budget for one scan. budget=None means unbounded."""
+
+    def __init__(self, budget: float = None):
+        self.budget = budget
+        self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        if self.budget is None:
+            return float("inf")
+        return self.budget - self.elapsed()
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        return self.remaining() <= reserve
+
+    def timeout(self, cap: float) -> float:
+        # Per-call timeout: never longer than the cap or what's left of the budget
+        return max(0.05, min(cap, self.remaining()))
+
+
+# Domain lookups have no timeout of their own, and requests' timeouts apply per
+# connect/read (per redirect hop, DNS not included), so lookups and the page
+# fetch run here and the scan stops waiting when the budget runs out.
+_lookups = ThreadPoolExecutor(max_workers=Config.LOOKUP_WORKERS, thread_name_prefix="lookup")
+
+
+def submit_lookup(fn, *args, **kwargs) -> Future:
+    """Run fn on the lookup pool; while a profiling session runs, the job is
+    sampled under the request that submitted it."""
+    return _lookups.submit(profiler.bind(fn), *args, **kwargs)
+
+
+PAGE_TIMEOUT = 3
+# Caps how long an abandoned fetch can keep a pool thread busy
+PAGE_MAX_REDIRECTS = 5
+PAGE_MAX_BYTES = 2 * 1024 * 1024
+# Time kept back for parsing and scoring once the page body has arrived
+PARSE_RESERVE = 0.25
+
+
+def _read_body(resp: requests.Response, deadline: Deadline):
+    chunks, size, truncated = [], 0, False
+    for chunk in resp.iter_content(chunk_size=16384):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= PAGE_MAX_BYTES or deadline.expired(PARSE_RESERVE):
+            truncated = True
+            break
+    resp.close()
+    body = b"".join(chunks)
+    return body.decode(resp.encoding or "utf-8", errors="replace"), truncated
+
+
+def fetch_page(url: str, deadline: Deadline = None, headers: dict = None):
+    """Returns (resp, text, soup, truncated). A 304 comes back with no body parsed.
+
+    resp is None if the fetch failed (timeout, connection error, too many
+    redirects); there is no page to score then, not an empty one.
+    """
+    session = requests.Session()
+    session.max_redirects = PAGE_MAX_REDIRECTS
     try:
-        resp = requests.get(url, timeout=3, allow_redirects=True)
-        text = resp.text if hasattr(resp, "text") else ""
+        if deadline is None:
+            resp = session.get(url, headers=headers, timeout=PAGE_TIMEOUT, allow_redirects=True)
+            if resp.status_code == 304:
+                return resp, "", None, False
+            text = resp.text if hasattr(resp, "text") else ""
+            truncated = False
+        else:
+            resp = session.get(url, headers=headers, timeout=deadline.timeout(PAGE_TIMEOUT),
+                               allow_redirects=True, stream=True)
+            if resp.status_code == 304:
+                resp.close()
+                return resp, "", None, False
+            text, truncated = _read_body(resp, deadline)
         soup = BeautifulSoup(text, "html.parser")
-        return resp, text, soup
+        return resp, text, soup, truncated
     except Exception:
-        return None, "", BeautifulSoup("", "html.parser")
+        return None, "", None, False
+    finally:
+        session.close()
 
 
-# -------- Extract All Features -------- #
+def page_features(resp, text: str, soup: BeautifulSoup, domain: str, redirects: int = 0) -> dict:
+    return {
+        "Favicon": favicon_from_soup(soup),
+        "Request_URL": request_url_from_soup(soup, domain),
+        "URL_of_Anchor": url_of_anchor_from_soup(soup, domain),
+        "Links_in_tags": links_in_tags_from_soup(soup, domain),
+        "SFH": sfh_from_soup(soup),
+        "Submitting_to_email": submitting_to_email_from_text(text),
+        "Redirect": redirects + (redirect_from_resp(resp) if resp is not None else 0),
+        "on_mouseover": on_mouseover_from_text(text),
+        "RightClick": right_click_from_text(text),
+        "popUpWidnow": popup_window_from_text(text),
+        "Iframe": iframe_from_text(text),
+    }
 
-def extract_features(url: str) -> dict:
-    parsed = urlparse(url)
-    domain = parsed.netloc
-    resp, text, soup = fetch_page(url)
+
+def fetch_page_features(url: str, domain: str, deadline: Deadline = None):
+    """HTML-derived features for `url`, revalidating any cached copy.
+
+    Cached entries are revalidated against the post-redirect URL, so the
+    redirect count from the original fetch is carried over. Returns
+    (features, truncated), or (None, False) if the page couldn't be fetched.
+    """
+    cached = page_cache.get(url)
+    target = cached["final_url"] if cached else url
+    resp, text, soup, truncated = fetch_page(target, deadline, page_cache.conditional_headers(cached))
+    if resp is None:
+        return None, False
+
+    if cached and resp.status_code == 304:
+        page_cache.revalidated(url, cached)
+        return dict(cached["features"]), False
+
+    redirects = cached["redirects"] if cached else 0
+    feats = page_features(resp, text, soup, domain, redirects)
+    if resp.status_code == 200 and not truncated:
+        page_cache.put(url, resp.url, resp.headers, feats["Redirect"], feats, changed=cached is not None)
+    return feats, truncated
+
+
+# -------- Cached Domain Lookups -------- #
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _iso(value):
+    value = _first(value)
+    return value.isoformat() if isinstance(value, datetime) else None
+
+
+def whois_record(domain: str, refresh: bool = False) -> dict:
+    """The parts of a WHOIS answer the features use, in a cacheable form."""
+    if not refresh:
+        hit = domain_cache.get("whois", domain)
+        if hit is not None:
+            return hit
     try:
         w = whois.whois(domain)
+        record = {
+            "ok": True,
+            "domain_name": bool(getattr(w, "domain_name", None)),
+            "expiration_date": _iso(getattr(w, "expiration_date", None)),
+            "creation_date": _iso(getattr(w, "creation_date", None)),
+        }
     except Exception:
+        record = {"ok": False, "domain_name": False, "expiration_date": None, "creation_date": None}
+    ttl = Config.WHOIS_TTL_S if record["ok"] else Config.NEGATIVE_TTL_S
+    domain_cache.put("whois", domain, record, ttl, negative=not record["ok"])
+    return record
+
+
+def dns_lookup(domain: str, refresh: bool = False) -> int:
+    if not refresh:
+        hit = domain_cache.get("dns", domain)
+        if hit is not None:
+            return hit
+    found = dns_record(domain)
+    domain_cache.put("dns", domain, found, Config.DNS_TTL_S if found else Config.NEGATIVE_TTL_S,
+                     negative=not found)
+    return found
+
+
+def _who(record: dict):
+    """Rebuild an object the *_from_who extractors understand."""
+    def parse(value):
+        return datetime.fromisoformat(value) if value else None
+    return SimpleNamespace(
+        domain_name=record["domain_name"],
+        expiration_date=parse(record["expiration_date"]),
+        creation_date=parse(record["creation_date"]),
+    )
+
+
+def _submit(kind: str, fn, domain: str) -> Future:
+    # Cache hits resolve immediately instead of queueing behind slow lookups
+    hit = domain_cache.get(kind, domain)
+    if hit is not None:
+        done = Future()
+        done.set_result(hit)
+        return done
+    # Already a counted miss, so the lookup goes straight to the network
+    return submit_lookup(fn, domain, refresh=True)
+
+
+def _wait(future, deadline: Deadline):
+    """Result of a lookup, or None if the budget ran out first."""
+    try:
+        return future.result(timeout=None if deadline.budget is None else max(0.0, deadline.remaining()))
+    except FutureTimeout:
+        future.cancel()
+        return None
+
+
+# -------- Extract All Features -------- #
+
+PAGE_FEATURES = [
+    "Favicon", "Request_URL", "URL_of_Anchor", "Links_in_tags", "SFH", "Submitting_to_email",
+    "Redirect", "on_mouseover", "RightClick", "popUpWidnow", "Iframe",
+]
+WHOIS_FEATURES = ["Domain_registeration_length", "Abnormal_URL", "age_of_domain"]
+DNS_FEATURES = ["DNSRecord"]
+# Filled by the placeholder functions above; never actually measured
+PLACEHOLDER_FEATURES = [
+    "web_traffic", "Page_Rank", "Google_Index", "Links_pointing_to_page", "Statistical_report",
+]
+
+# Used for features we ran out of time to measure. Mostly the same "no signal"
+# values the extractors return on empty input; Abnormal_URL and DNSRecord would
+# otherwise read as a failed lookup, which is evidence against the site.
+NEUTRAL_DEFAULTS = {
+    "Favicon": 0,
+    "Request_URL": 0,
+    "URL_of_Anchor": 0,
+    "Links_in_tags": 0,
+    "SFH": 1,
+    "Submitting_to_email": 0,
+    "Redirect": 0,
+    "on_mouseover": 0,
+    "RightClick": 0,
+    "popUpWidnow": 0,
+    "Iframe": 0,
+    "Domain_registeration_length": -1,
+    "Abnormal_URL": 0,
+    "age_of_domain": -1,
+    "DNSRecord": 1,
+}
+
+
+def extract_features_within(url: str, budget: float = None):
+    """Extract features within `budget` seconds.
+
+    Returns (features, completeness). Lookups still outstanding when the budget
+    runs out, and a page fetch that fails, are reported as skipped and their
+    features get NEUTRAL_DEFAULTS.
+
+    Complete results go into the shared cache for SCAN_RESULT_TTL_S, so any
+    worker can reuse them. While another worker is scanning the same URL we
+    wait for its result, but only as long as our own budget allows.
+    """
+    deadline = Deadline(budget)
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return _extract_within(url, deadline)
+
+    wait = 30.0 if budget is None else max(0.0, deadline.remaining() - PARSE_RESERVE)
+    features, completeness = cache.get_or_compute(
+        "scan:" + url, compute, Config.SCAN_RESULT_TTL_S,
+        should_store=lambda result: result[1]["complete"], wait=wait,
+    )
+    if not computed:
+        completeness = dict(
+            completeness, cached=True,
+            budget_ms=None if budget is None else int(budget * 1000),
+            elapsed_ms=int(deadline.elapsed() * 1000),
+        )
+    return dict(features), completeness
+
+
+def _extract_within(url: str, deadline: Deadline):
+    budget = deadline.budget
+    parsed = urlparse(url)
+    domain = parsed.netloc
+
+    # Domain lookups and the page fetch all run on the pool, so the wait below
+    # is what bounds the scan, not the libraries' own timeouts
+    whois_future = _submit("whois", whois_record, domain)
+    dns_future = _submit("dns", dns_lookup, domain)
+    page_future = submit_lookup(
+        fetch_page_features, url, domain, deadline if budget is not None else None
+    )
+
+    skipped, partial = [], []
+    fetched = _wait(page_future, deadline)
+    page, truncated = fetched if fetched is not None else (None, False)
+    if page is None:
+        # Out of time, or the fetch itself failed
+        skipped += PAGE_FEATURES
+    elif truncated:
+        partial += PAGE_FEATURES
+
+    record = _wait(whois_future, deadline)
+    if record is None:
+        skipped += WHOIS_FEATURES
+    w = _who(record) if record is not None else None
+    dns = _wait(dns_future, deadline)
+    if dns is None:
+        skipped += DNS_FEATURES
+
+    features = _score(url, domain, page, w, dns)
+    for name in skipped:
+        features[name] = NEUTRAL_DEFAULTS[name]
+
+    completeness = {
+        "complete": not skipped and not partial,
+        "measured": [k for k in features if k not in skipped and k not in PLACEHOLDER_FEATURES],
+        "skipped": skipped,
+        "partial": partial,
+        "budget_ms": None if budget is None else int(budget * 1000),
+        "elapsed_ms": int(deadline.elapsed() * 1000),
+    }
+    return features, completeness
+
+
+def extract_features(url: str, budget: float = None) -> dict:
+    return extract_features_within(url, budget)[0]
+
+
+def _score(url: str, domain: str, page, w, dns) -> dict:
+    if page is None:
+        page = dict((k, NEUTRAL_DEFAULTS[k]) for k in PAGE_FEATURES)
+    if w is None:
         w = type("W", (), {})()
     return {
         "having_IP_Address": having_ip_address(url),
@@ -269,22 +580,22 @@ def extract_features(url: str) -> dict:
         "having_Sub_Domain": having_sub_domain(url),
         "SSLfinal_State": ssl_final_state(url),
         "Domain_registeration_length": domain_registration_length_from_who(w),
-        "Favicon": favicon_from_soup(soup),
+        "Favicon": page["Favicon"],
         "port": 1 if ":" in domain else 0,
         "HTTPS_token": 1 if "https" in domain else 0,
-        "Request_URL": request_url_from_soup(soup, domain),
-        "URL_of_Anchor": url_of_anchor_from_soup(soup, domain),
-        "Links_in_tags": links_in_tags_from_soup(soup, domain),
-        "SFH": sfh_from_soup(soup),
-        "Submitting_to_email": submitting_to_email_from_text(text),
+        "Request_URL": page["Request_URL"],
+        "URL_of_Anchor": page["URL_of_Anchor"],
+        "Links_in_tags": page["Links_in_tags"],
+        "SFH": page["SFH"],
+        "Submitting_to_email": page["Submitting_to_email"],
         "Abnormal_URL": abnormal_url_from_who(w),
-        "Redirect": redirect_from_resp(resp) if resp is not None else 0,
-        "on_mouseover": on_mouseover_from_text(text),
-        "RightClick": right_click_from_text(text),
-        "popUpWidnow": popup_window_from_text(text),
-        "Iframe": iframe_from_text(text),
+        "Redirect": page["Redirect"],
+        "on_mouseover": page["on_mouseover"],
+        "RightClick": page["RightClick"],
+        "popUpWidnow": page["popUpWidnow"],
+        "Iframe": page["Iframe"],
         "age_of_domain": age_of_domain_from_who(w),
-        "DNSRecord": dns_record(domain),
+        "DNSRecord": dns if dns is not None else 0,
         "web_traffic": web_traffic(url),
         "Page_Rank": page_rank(url),
         "Google_Index": google_index(url),
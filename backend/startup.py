@@ -0,0 +1,118 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+# Boot-time profile: how long each import / initialisation step took, and how
+# long after boot the first request was answered. Served at /api/debug/startup.
+
+BOOT_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_steps = []
+_state = {
+    "app_ready_s": None,
+    "first_request_s": None,
+    "scan_stack_ready_s": None,
+    "warmup_error": None,
+}
+
+
+def _since_boot() -> float:
+    return round(time.perf_counter() - BOOT_STARTED, 4)
+
+
+@contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        step = {
+            "name": name,
+            "seconds": round(time.perf_counter() - started, 4),
+            "finished_at_s": _since_boot(),
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            step["error"] = error
+        with _lock:
+            _steps.append(step)
+
+
+def timed_import(module: str):
+    with timed(f"import {module}"):
+        return importlib.import_module(module)
+
+
+def mark(key: str):
+    with _lock:
+        if _state[key] is None:
+            _state[key] = _since_boot()
+
+
+def report() -> dict:
+    with _lock:
+        steps = list(_steps)
+        state = dict(_state)
+    state["uptime_s"] = _since_boot()
+    state["steps"] = steps
+    state["slowest"] = sorted(steps, key=lambda s: s["seconds"], reverse=True)[:5]
+    return state
+
+
+# ---------------- Scan stack warm-up ---------------- #
+
+# Heavy dependencies first so each one shows up separately in the report;
+# model_infer's own line is then just the model load.
+SCAN_STACK = ["numpy", "requests", "bs4", "whois", "model_infer", "scrape"]
+
+_warmup_lock = threading.Lock()
+_warmup_thread = None
+
+
+def warm_scan_stack():
+    try:
+        for module in SCAN_STACK:
+            timed_import(module)
+        with timed("mongo ping"):
+            import db
+            db.ping()
+        mark("scan_stack_ready_s")
+    except Exception as e:
+        with _lock:
+            _state["warmup_error"] = str(e)
+        print(f"❌ Warm-up failed: {e}")
+
+
+def run_db_setup():
+    try:
+        with timed("mongo indexes"):
+            import db
+            db.ensure_indexes()
+    except Exception as e:
+        print(f"❌ DB setup failed: {e}")
+
+
+def start_background_services():
+    """Things the app needs whether or not the scan stack is warmed up:
+    the query indexes (run off-thread, they wait on Mongo) and the refresher."""
+    threading.Thread(target=run_db_setup, name="db-setup", daemon=True).start()
+    if Config.REFRESH_ENABLED:
+        import refresher
+        refresher.start()
+
+
+def start_warmup():
+    """Load the scan stack in the background so auth routes can answer first."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_scan_stack, name="warmup", daemon=True)
+            _warmup_thread.start()
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Flat-array evaluator for tree ensembles exported by export_model.py.
+# Only needs numpy, so workers don't pay for importing sklearn at boot.
+
+TREES_DIR = os.path.join(os.path.dirname(__file__), "model_trees")
+
+_ARRAYS = ("feature", "threshold", "children_left", "children_right", "leaf_proba", "roots", "classes")
+
+
+class CompiledForest:
+    """All trees of the ensemble packed into one set of node arrays.
+
+    Node ids are global across trees. Leaves point at themselves, so every
+    (row, tree) cursor can be stepped `max_depth` times without branching.
+    """
+
+    def __init__(self, feature, threshold, children_left, children_right,
+                 leaf_proba, roots, classes, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def apply(self, X) -> np.ndarray:
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        # Accumulate tree by tree, in estimator order, like sklearn's forests
+        proba = np.zeros((leaves.shape[0], self.leaf_proba.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):
+            proba += self.leaf_proba[leaves[:, t]]
+        if self.n_trees > 1:
+            proba /= self.n_trees
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def save(arrays: dict, meta: dict, path: str = TREES_DIR):
+    os.makedirs(path, exist_ok=True)
+    for name in _ARRAYS:
+        np.save(os.path.join(path, name + ".npy"), arrays[name], allow_pickle=False)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load(path: str = TREES_DIR, mmap: bool = True) -> CompiledForest:
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode, allow_pickle=False)
+        for name in _ARRAYS
+    }
+    return CompiledForest(max_depth=meta["max_depth"], n_features=meta["n_features"], **arrays)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(path: str = TREES_DIR):
+    """sha256 of the model.pkl this export was made from (None for old exports)."""
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f).get("source_sha256")
+
+
+def exists(path: str = TREES_DIR) -> bool:
+    return os.path.exists(os.path.join(path, "meta.json"))